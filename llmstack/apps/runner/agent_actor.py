@@ -285,7 +285,7 @@ class AgentActor(OutputActor):
                 logger.exception(f"Error processing controller output: {e}")
 
     def on_receive(self, message: Message) -> None:
-        if message.type == MessageType.CONTENT:
+        if message.type == MessageType.CONTENT or message.type == MessageType.CONTENT_STREAM_FINAL:
             if message.sender == "_inputs0":
                 if self._is_voice_agent:
                     # For voice agents, we send both text and audio streams if available
@@ -420,31 +420,32 @@ class AgentActor(OutputActor):
             tool_call_id = message.sender.split("/")[2]
 
             if message.type == MessageType.CONTENT_STREAM_CHUNK:
-                self._stitched_data = stitch_model_objects(
-                    self._stitched_data,
-                    {message.sender: message.data.chunk},
-                )
+                for chunk in message.data.chunks:
+                    self._stitched_data = stitch_model_objects(
+                        self._stitched_data,
+                        {message.sender: chunk},
+                    )
 
-                # Render the tool call output
-                template = self._templates.get(tool_name, None)
-                tool_call_output = render_template(template, self._stitched_data[message.sender])
+                    # Render the tool call output
+                    template = self._templates.get(tool_name, None)
+                    tool_call_output = render_template(template, self._stitched_data[message.sender])
 
-                prev_tool_call_output = self._agent_outputs.get(
-                    f"agent_tool_call_output__{output_index}__{tool_name}__{tool_call_id}",
-                    "",
-                )
-                self._agent_outputs[
-                    f"agent_tool_call_output__{output_index}__{tool_name}__{tool_call_id}"
-                ] = tool_call_output
+                    prev_tool_call_output = self._agent_outputs.get(
+                        f"agent_tool_call_output__{output_index}__{tool_name}__{tool_call_id}",
+                        "",
+                    )
+                    self._agent_outputs[
+                        f"agent_tool_call_output__{output_index}__{tool_name}__{tool_call_id}"
+                    ] = tool_call_output
 
-                delta = self._dmp.to_delta(prev_tool_call_output, tool_call_output)
+                    delta = self._dmp.to_delta(prev_tool_call_output, tool_call_output)
 
-                self._content_queue.put_nowait(
-                    {
-                        "deltas": {f"agent_tool_call_output__{output_index}__{tool_name}__{tool_call_id}": delta},
-                        "chunk": {message.sender: message.data.chunk},
-                    }
-                )
+                    self._content_queue.put_nowait(
+                        {
+                            "deltas": {f"agent_tool_call_output__{output_index}__{tool_name}__{tool_call_id}": delta},
+                            "chunk": {message.sender: chunk},
+                        }
+                    )
             else:
                 self._add_error_from_tool_call(
                     output_index, tool_name, tool_call_id, [error.message for error in message.data.errors]
@@ -108,11 +108,21 @@ class AppCoordinator(ThreadingActor):
                 **self._actor_configs_map[actor_id_prefix].kwargs,
             )
 
-        if message.type == MessageType.BEGIN or message.type == MessageType.CONTENT:
+        if message.type in (MessageType.BEGIN, MessageType.CONTENT, MessageType.CONTENT_STREAM_FINAL):
             self._bookkeeping_queue.put_nowait((actor_id, None))
 
         self.actors[actor_id].tell(message)
 
+    def on_receive(self, message: Any) -> Any:
+        # Output streams tell their messages to the coordinator to be relayed.
+        # A failure here would stop the coordinator, so only log it like a
+        # failed proxy call would have been.
+        if isinstance(message, Message):
+            try:
+                self.relay(message)
+            except Exception as e:
+                logger.exception(f"Failed to relay message from {message.sender}: {e}")
+
     def relay(self, message: Message):
         actor_id = message.sender.split("/")[0]
         logger.debug(f"Relaying message {message} to {self._actor_dependents.get(actor_id)}")
@@ -52,31 +52,28 @@ class OutputActor(Actor):
             return
 
         if message.type == MessageType.CONTENT_STREAM_CHUNK:
-            try:
-                self._stitched_data = stitch_model_objects(
-                    self._stitched_data,
-                    (
-                        {message.sender: message.data.chunk}
-                        if message.sender not in self._spread_output_for_keys
-                        else message.data.chunk
-                    ),
-                )
-                new_int_output = render_template(self._templates["output"], self._stitched_data)
-                delta = self._dmp.to_delta(self._int_output.get("output", ""), new_int_output)
-                self._int_output["output"] = new_int_output
-
-                self._output_stream.bookkeep(BookKeepingData(output=self._int_output))
-
-                self._content_queue.put_nowait(
-                    {
-                        "deltas": {"output": delta},
-                        "chunk": {message.sender: message.data.chunk},
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Error processing content stream chunk: {e}")
-
-        if message.type == MessageType.CONTENT:
+            for chunk in message.data.chunks:
+                try:
+                    self._stitched_data = stitch_model_objects(
+                        self._stitched_data,
+                        ({message.sender: chunk} if message.sender not in self._spread_output_for_keys else chunk),
+                    )
+                    new_int_output = render_template(self._templates["output"], self._stitched_data)
+                    delta = self._dmp.to_delta(self._int_output.get("output", ""), new_int_output)
+                    self._int_output["output"] = new_int_output
+
+                    self._output_stream.bookkeep(BookKeepingData(output=self._int_output))
+
+                    self._content_queue.put_nowait(
+                        {
+                            "deltas": {"output": delta},
+                            "chunk": {message.sender: chunk},
+                        }
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing content stream chunk: {e}")
+
+        if message.type == MessageType.CONTENT or message.type == MessageType.CONTENT_STREAM_FINAL:
             self._messages[message.sender] = (
                 message.data.content.model_dump()
                 if isinstance(message.data.content, BaseModel)
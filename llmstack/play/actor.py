@@ -88,9 +88,10 @@ class Actor(ThreadingActor):
             pass
 
         if message.type == MessageType.CONTENT_STREAM_CHUNK:
-            self.input_stream({message.sender: message.data.chunk})
+            for chunk in message.data.chunks:
+                self.input_stream({message.sender: chunk})
 
-        if message.type == MessageType.CONTENT:
+        if message.type == MessageType.CONTENT or message.type == MessageType.CONTENT_STREAM_FINAL:
             message_data = (
                 message.data.content.model_dump()
                 if isinstance(message.data.content, BaseModel)
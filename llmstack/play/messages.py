@@ -12,6 +12,9 @@ class MessageType(StrEnum):
     CONTENT_STREAM_CHUNK = "CONTENT_STREAM_CHUNK"
     CONTENT_STREAM_BEGIN = "CONTENT_STREAM_BEGIN"
     CONTENT_STREAM_END = "CONTENT_STREAM_END"
+    # Ends a content stream and carries its final content, i.e.
+    # CONTENT_STREAM_END followed by CONTENT in a single message
+    CONTENT_STREAM_FINAL = "CONTENT_STREAM_FINAL"
     ERRORS = "ERRORS"
 
 
@@ -33,7 +36,9 @@ class ContentData(MessageData):
 
 
 class ContentStreamChunkData(MessageData):
-    chunk: Any
+    # Actors run as threads, so chunks are handed to receivers by reference
+    # rather than serialized. Receivers must treat them as read-only.
+    chunks: List[Any]
 
 
 class Message(BaseModel):
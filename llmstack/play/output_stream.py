@@ -3,14 +3,21 @@ This module contains the OutputStream class.
 """
 
 import asyncio
+import heapq
+import itertools
 import logging
+import threading
 import time
+import types
+import typing
 import uuid
-from collections import defaultdict
-from typing import Any, Dict, Type
+import weakref
+from collections import deque
+from copy import deepcopy
+from typing import Any, Callable, Dict, Optional, Type
 
 from pydantic import BaseModel
-from pykka import ActorProxy, ActorRegistry
+from pykka import ActorDeadError, ActorProxy, ActorRegistry
 
 from llmstack.common.blocks.base.schema import StrEnum
 from llmstack.play.messages import (
@@ -26,6 +33,109 @@ __all__ = ["OutputStream"]
 
 logger = logging.getLogger(__name__)
 
+# Chunks written to the stream are buffered and relayed to the coordinator in
+# batches. A batch is flushed once it holds CHUNK_BATCH_SIZE chunks or when more
+# than CHUNK_BATCH_INTERVAL seconds have passed since the last flush. Partial
+# batches are flushed by _ChunkFlusher so no chunk waits longer than
+# CHUNK_BATCH_INTERVAL.
+CHUNK_BATCH_SIZE = 32
+CHUNK_BATCH_INTERVAL = 0.005
+
+# When the coordinator cannot be resolved, the lookup is retried at most once
+# every COORDINATOR_RETRY_INTERVAL seconds. Messages relayed in the meantime
+# are held, up to UNDELIVERED_MAX_MESSAGES with the oldest dropped first, and
+# delivered by the next relay that resolves the coordinator.
+COORDINATOR_RETRY_INTERVAL = 1.0
+UNDELIVERED_MAX_MESSAGES = 64
+
+# Message types relayed by OutputStream, bound once at import
+_CHUNK_TYPE = MessageType.CONTENT_STREAM_CHUNK
+_FINAL_TYPE = MessageType.CONTENT_STREAM_FINAL
+_ERRORS_TYPE = MessageType.ERRORS
+
+# Generated stitchers per output class, see _build_stitcher
+_STITCHERS: "weakref.WeakKeyDictionary[type, Callable[[Any, Any], Any]]" = weakref.WeakKeyDictionary()
+
+
+def _stitch_models(obj1: BaseModel, obj2: BaseModel) -> BaseModel:
+    model_cls = type(obj1)
+
+    # Stitched fields are already validated values, skip re-validation
+    stitched_obj = model_cls.model_construct(
+        **{field: stitch_model_objects(getattr(obj1, field), getattr(obj2, field)) for field in model_cls.model_fields},
+    )
+
+    # Keep obj1's fields set, extra fields and private attributes, as model_copy did
+    object.__setattr__(stitched_obj, "__pydantic_fields_set__", set(obj1.__pydantic_fields_set__))
+    if obj1.__pydantic_extra__ is not None:
+        object.__setattr__(stitched_obj, "__pydantic_extra__", dict(obj1.__pydantic_extra__))
+    if obj1.__pydantic_private__ is not None:
+        object.__setattr__(stitched_obj, "__pydantic_private__", dict(obj1.__pydantic_private__))
+    return stitched_obj
+
+
+def _stitch_dicts(obj1: dict, obj2: dict) -> dict:
+    stitched_fields = dict(obj1)
+    for field, value in obj2.items():
+        stitched_fields[field] = stitch_model_objects(obj1[field], value) if field in obj1 else value
+    return stitched_fields
+
+
+def _stitch_lists(obj1: list, obj2: list) -> list:
+    if not obj1:
+        return obj2
+    if not obj2:
+        return obj1
+
+    # Only the shared prefix needs stitching, the tail of the longer list
+    # is taken as is
+    min_length = min(len(obj1), len(obj2))
+    stitched_obj = [stitch_model_objects(item1, item2) for item1, item2 in zip(obj1, obj2)]
+    stitched_obj.extend(obj1[min_length:] if len(obj1) > min_length else obj2[min_length:])
+    return stitched_obj
+
+
+def _stitch_enums(obj1: StrEnum, obj2: StrEnum) -> StrEnum:
+    return obj1 if obj1.value == obj2.value else obj2
+
+
+def _stitch_strs(obj1: str, obj2: str) -> str:
+    return obj1 + obj2
+
+
+def _stitch_values(obj1: Any, obj2: Any) -> Any:
+    return obj2 if obj2 else obj1
+
+
+# Stitch handlers for objects of the same type, looked up by exact type
+_STITCH_HANDLERS: Dict[type, Callable[[Any, Any], Any]] = {
+    dict: _stitch_dicts,
+    list: _stitch_lists,
+    str: _stitch_strs,
+}
+
+# Stitch handlers resolved for other types on first use
+_RESOLVED_STITCH_HANDLERS: "weakref.WeakKeyDictionary[type, Callable[[Any, Any], Any]]" = weakref.WeakKeyDictionary()
+
+
+def _resolve_stitch_handler(cls: type) -> Callable[[Any, Any], Any]:
+    handler = _RESOLVED_STITCH_HANDLERS.get(cls)
+    if handler is None:
+        if issubclass(cls, BaseModel):
+            handler = _stitch_models
+        elif issubclass(cls, dict):
+            handler = _stitch_dicts
+        elif issubclass(cls, list):
+            handler = _stitch_lists
+        elif issubclass(cls, StrEnum):
+            handler = _stitch_enums
+        elif issubclass(cls, str):
+            handler = _stitch_strs
+        else:
+            handler = _stitch_values
+        _RESOLVED_STITCH_HANDLERS[cls] = handler
+    return handler
+
 
 def stitch_model_objects(obj1: Any, obj2: Any) -> Any:
     """Stitch two objects together.
@@ -42,54 +152,195 @@ def stitch_model_objects(obj1: Any, obj2: Any) -> Any:
     if obj2 is None:
         return obj1
 
-    # If both objects are BaseModels and the same type, stitch the fields
-    if isinstance(obj1, BaseModel) and isinstance(obj2, BaseModel) and type(obj1) == type(obj2):  # noqa: E721
-        stitched_obj = obj1.model_copy()
-        for field in obj1.model_fields:
-            setattr(
-                stitched_obj,
-                field,
-                stitch_model_objects(getattr(obj1, field), getattr(obj2, field)),
-            )
-        return stitched_obj
-
-    def stitch_fields(
-        obj1_fields: Dict[str, Any],
-        obj2_fields: Dict[str, Any],
-    ) -> Dict[str, Any]:
-        stitched_fields = defaultdict(Any)
-        for field in set(obj1_fields).union(obj2_fields):
-            stitched_fields[field] = stitch_model_objects(
-                obj1_fields.get(field, None),
-                obj2_fields.get(field, None),
-            )
-        return dict(stitched_fields)
+    obj_type = type(obj1)
+    if obj_type is type(obj2):
+        handler = _STITCH_HANDLERS.get(obj_type)
+        if handler is not None and not obj2:
+            # An empty dict, list or str adds nothing to obj1
+            return obj1
+        if handler is None:
+            handler = _resolve_stitch_handler(obj_type)
+        return handler(obj1, obj2)
 
+    # Objects of different types, BaseModels are only stitched with their own type
     if isinstance(obj1, dict) and isinstance(obj2, dict):
-        return stitch_fields(obj1, obj2)
-
+        return _stitch_dicts(obj1, obj2)
     elif isinstance(obj1, list) and isinstance(obj2, list):
-        if not obj1:
-            return obj2
-        if not obj2:
-            return obj1
+        return _stitch_lists(obj1, obj2)
+    elif isinstance(obj1, StrEnum) and isinstance(obj2, StrEnum):
+        return _stitch_enums(obj1, obj2)
+    elif isinstance(obj1, str) and isinstance(obj2, str):
+        return _stitch_strs(obj1, obj2)
+    else:
+        return _stitch_values(obj1, obj2)
 
-        stitched_obj = []
-        max_length = max(len(obj1), len(obj2))
-        for i in range(max_length):
-            item1 = obj1[i] if i < len(obj1) else None
-            item2 = obj2[i] if i < len(obj2) else None
-            stitched_obj.append(stitch_model_objects(item1, item2))
-        return stitched_obj
 
-    elif isinstance(obj1, StrEnum) and isinstance(obj2, StrEnum):
-        return obj1 if obj1.value == obj2.value else obj2
+def _copy_containers(value: Any) -> Any:
+    """Copy the dicts and lists in a dumped value, sharing everything else.
 
-    elif isinstance(obj1, str) and isinstance(obj2, str):
-        return obj1 + obj2
+    _stitch_into only mutates dicts and lists, so other objects can be
+    shared safely. This is about twice as fast as deepcopy on dumped data.
+    Container subclasses fall back to deepcopy.
+    """
+    value_type = type(value)
+    if value_type is dict:
+        return {key: _copy_containers(item) for key, item in value.items()}
+    if value_type is list:
+        return [_copy_containers(item) for item in value]
+    if isinstance(value, (dict, list)):
+        return deepcopy(value)
+    return value
 
-    else:
-        return obj2 if obj2 else obj1
+
+def _stitch_into(dst: Any, src: Any) -> Any:
+    """Stitch src into dst, mutating dst in place where possible.
+
+    Dicts and lists in dst are updated in place and only colliding keys or
+    indices are recursed into. Values taken over from src are copied so dst
+    never shares state with chunks that were already relayed.
+
+    Args:
+      dst: The accumulated object (dumped dict, list or scalar).
+      src: The new chunk to stitch into dst.
+
+    Returns:
+      The stitched object. This is dst itself unless dst is immutable.
+    """
+    if src is None:
+        return dst
+    if dst is None:
+        return _copy_containers(src)
+
+    if isinstance(dst, dict) and isinstance(src, dict):
+        for key, value in src.items():
+            dst[key] = _stitch_into(dst.get(key), value)
+        return dst
+
+    if isinstance(dst, list) and isinstance(src, list):
+        for i, value in enumerate(src):
+            if i < len(dst):
+                dst[i] = _stitch_into(dst[i], value)
+            else:
+                dst.append(_copy_containers(value))
+        return dst
+
+    # The stitched value may be src itself (e.g. when a key changes type
+    # between chunks), copy it so later writes never mutate a relayed chunk
+    return _copy_containers(stitch_model_objects(dst, src))
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    """Returns X for Optional[X] annotations and the annotation otherwise."""
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _build_stitcher(model_cls: Type[BaseModel]) -> Callable[[Any, Any], Any]:
+    """Generate a stitcher specialized for the dumped form of model_cls.
+
+    The generated function behaves like _stitch_into but unrolls the known
+    fields of model_cls: string fields are concatenated inline and nested
+    models call their own generated function. Chunks that are not dicts or
+    carry unknown keys fall back to _stitch_into.
+
+    Args:
+      model_cls: The BaseModel subclass whose dumps will be stitched.
+
+    Returns:
+      A function stitch(dst, src) that returns the stitched object.
+    """
+    if model_cls in _STITCHERS:
+        return _STITCHERS[model_cls]
+
+    namespace = {"_stitch_into": _stitch_into, "_copy_containers": _copy_containers, "_MISSING": object()}
+    func_names: Dict[type, str] = {}
+    pending = []
+    lines = []
+
+    def func_name(cls: type) -> str:
+        if cls not in func_names:
+            func_names[cls] = f"_stitch_{len(func_names)}"
+            pending.append(cls)
+        return func_names[cls]
+
+    func_name(model_cls)
+    while pending:
+        cls = pending.pop()
+        name = func_names[cls]
+        namespace[f"{name}_keys"] = frozenset(cls.model_fields)
+        lines += [
+            f"def {name}(a, b):",
+            f"    if type(a) is not dict or type(b) is not dict or not b.keys() <= {name}_keys:",
+            "        return _stitch_into(a, b)",
+        ]
+        for field, field_info in cls.model_fields.items():
+            annotation = _unwrap_optional(field_info.annotation)
+            if annotation is str:
+                merge = "v if d is None else (d + v if type(d) is str and type(v) is str else _stitch_into(d, v))"
+            elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                merge = f"_copy_containers(v) if d is None else {func_name(annotation)}(d, v)"
+            else:
+                merge = "_stitch_into(d, v)"
+            lines += [
+                f"    v = b.get({field!r}, _MISSING)",
+                "    if v is not _MISSING:",
+                f"        d = a.get({field!r})",
+                "        if v is not None:",
+                f"            a[{field!r}] = {merge}",
+                "        elif d is None:",
+                f"            a[{field!r}] = d",
+            ]
+        lines.append("    return a")
+
+    exec(compile("\n".join(lines), f"<stitcher {model_cls.__qualname__}>", "exec"), namespace)
+
+    stitcher = namespace[func_names[model_cls]]
+    _STITCHERS[model_cls] = stitcher
+    return stitcher
+
+
+class _ChunkFlusher:
+    """
+    Flushes partial chunk batches of all output streams from one daemon thread.
+
+    Writes may run on short-lived event loops, so deferred flushes cannot be
+    scheduled on the loop. Streams register a deadline instead and the thread
+    calls their _flush_chunks once it passes.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._deadlines = []  # Heap of (deadline, sequence, stream)
+        self._sequence = itertools.count()
+        self._thread = None
+
+    def schedule(self, stream: "OutputStream", deadline: float) -> None:
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="output-stream-flusher", daemon=True)
+                self._thread.start()
+
+            heapq.heappush(self._deadlines, (deadline, next(self._sequence), stream))
+            if self._deadlines[0][2] is stream:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._deadlines or self._deadlines[0][0] > time.monotonic():
+                    self._condition.wait(self._deadlines[0][0] - time.monotonic() if self._deadlines else None)
+                _, _, stream = heapq.heappop(self._deadlines)
+
+            try:
+                stream._flush_chunks()
+            except Exception as e:
+                logger.exception(f"Failed to flush output stream {stream._stream_id}: {e}")
+
+
+_FLUSHER = _ChunkFlusher()
 
 
 class OutputStream:
@@ -107,75 +358,144 @@ class OutputStream:
         """
         Initializes the OutputStream class.
         """
-        self._message_id = str(uuid.uuid4())
+        self._message_id = uuid.uuid4().hex
         self._data = None
         self._output_cls = output_cls
+        self._stitch = (
+            _build_stitcher(output_cls)
+            if isinstance(output_cls, type) and issubclass(output_cls, BaseModel)
+            else _stitch_into
+        )
         self._stream_id = stream_id
         self._coordinator_urn = coordinator_urn
+        self._coordinator_ref = None
         self._coordinator_proxy = None
+        self._coordinator_retry_at = 0.0
+        self._undelivered = deque(maxlen=UNDELIVERED_MAX_MESSAGES)
         self._bookkeeping_queue = bookkeeping_queue
+        # Fields shared by every message this stream relays
+        self._msg_base = {"id": self._message_id, "sender": self._stream_id, "receiver": "coordinator"}
+        self._pending_chunks: list = []
+        self._last_flush: float = 0.0
+        self._flush_scheduled = False
+        # Guards the pending chunks and relay state, partial batches are
+        # flushed from the _ChunkFlusher thread
+        self._lock = threading.RLock()
 
     @property
-    def _coordinator(self) -> ActorProxy:
+    def _coordinator(self) -> Optional[ActorProxy]:
         """
-        Returns the coordinator.
+        Returns the coordinator or None if it cannot be resolved.
         """
-        if not self._coordinator_proxy:
-            try:
-                self._coordinator_proxy = ActorRegistry.get_by_urn(
-                    self._coordinator_urn,
-                ).proxy()
-            except Exception as e:
-                logger.error(f"Failed to get coordinator proxy for {self._coordinator_urn}: {e}")
+        if self._coordinator_ref is not None and self._coordinator_ref.is_alive():
+            return self._coordinator_proxy
+
+        now = time.monotonic()
+        if now < self._coordinator_retry_at:
+            return None
+
+        try:
+            self._coordinator_ref = ActorRegistry.get_by_urn(self._coordinator_urn)
+            self._coordinator_proxy = self._coordinator_ref.proxy()
+        except Exception as e:
+            logger.error(f"Failed to get coordinator proxy for {self._coordinator_urn}: {e}")
+            self._coordinator_ref = None
+            self._coordinator_proxy = None
+            self._coordinator_retry_at = now + COORDINATOR_RETRY_INTERVAL
 
         return self._coordinator_proxy
 
+    def _relay(self, message: Message, ask: bool = False) -> Any:
+        """
+        Relays message to the coordinator, holding it if the coordinator is unavailable.
+
+        Messages are told to the coordinator so the producer does not pay for
+        a proxy call and its future. With ask set, the coordinator's relay is
+        called through the proxy instead and its future is returned. Asked
+        messages are never held, ActorDeadError is raised if the coordinator
+        is unavailable so the caller can handle the failure.
+
+        Held messages are not retried on their own. They are only delivered
+        by a later relay that finds the coordinator, so a message held by
+        finalize or error is lost unless the stream relays again.
+        """
+        with self._lock:
+            coordinator = self._coordinator
+            if coordinator is None:
+                if ask:
+                    raise ActorDeadError(f"Coordinator {self._coordinator_urn} is not available")
+                if len(self._undelivered) == self._undelivered.maxlen:
+                    logger.warning(f"Dropping undelivered message for {self._coordinator_urn}")
+                if message.type is not _CHUNK_TYPE:
+                    logger.warning(
+                        f"Holding {message.type} message from {self._stream_id}, "
+                        f"coordinator {self._coordinator_urn} is not available"
+                    )
+                self._undelivered.append(message)
+                return None
+
+            while self._undelivered:
+                self._coordinator_ref.tell(self._undelivered.popleft())
+
+            if ask:
+                return coordinator.relay(message)
+
+            self._coordinator_ref.tell(message)
+
+    def _flush_chunks(self) -> None:
+        """
+        Relays the buffered chunks to the coordinator as a single message.
+        """
+        with self._lock:
+            self._flush_scheduled = False
+
+            self._last_flush = time.monotonic()
+            if not self._pending_chunks:
+                return
+
+            chunks, self._pending_chunks = self._pending_chunks, []
+            # Messages are built from trusted values, skip validation
+            self._relay(
+                Message.model_construct(
+                    **self._msg_base,
+                    type=_CHUNK_TYPE,
+                    data=ContentStreamChunkData.model_construct(chunks=chunks),
+                ),
+            )
+
     async def write(self, data: Any) -> None:
         """
         Stitches fields from data to _data.
         """
 
-        self._coordinator.relay(
-            Message(
-                id=self._message_id,
-                type=MessageType.CONTENT_STREAM_CHUNK,
-                sender=self._stream_id,
-                receiver="coordinator",
-                data=ContentStreamChunkData(
-                    chunk=(
-                        data.model_dump()
-                        if isinstance(
-                            data,
-                            BaseModel,
-                        )
-                        else data
-                    ),
-                ),
-            ),
-        )
+        # Dump once and reuse the result for both the relayed chunk and the
+        # accumulated data
+        dumped = data.model_dump() if isinstance(data, BaseModel) else data
 
-        if self._data is None:
-            self._data = (
-                data.model_dump()
-                if isinstance(
-                    data,
-                    BaseModel,
-                )
-                else data
-            )
-        else:
-            self._data = stitch_model_objects(self._data, data)
-        await asyncio.sleep(0.0001)
+        self._data = _copy_containers(dumped) if self._data is None else self._stitch(self._data, dumped)
+
+        with self._lock:
+            self._pending_chunks.append(dumped)
+            since_flush = time.monotonic() - self._last_flush
+            flush = len(self._pending_chunks) >= CHUNK_BATCH_SIZE or since_flush > CHUNK_BATCH_INTERVAL
+            if flush:
+                self._flush_chunks()
+            elif not self._flush_scheduled:
+                self._flush_scheduled = True
+                _FLUSHER.schedule(self, self._last_flush + CHUNK_BATCH_INTERVAL)
+
+        if flush:
+            # Yield once per batch rather than once per chunk. Since a batch
+            # holds at most CHUNK_BATCH_SIZE chunks, this bounds how long a
+            # busy producer can hold the loop.
+            await asyncio.sleep(0)
 
     async def write_raw(self, message: Message) -> None:
         """
         Writes raw message to the output stream.
         """
-        response = self._coordinator.relay(message)
-
-        await asyncio.sleep(0.0001)
-
-        return response
+        self._flush_chunks()
+        return self._relay(message, ask=True)
 
     def get_data(self) -> BaseModel:
         """
@@ -194,25 +514,15 @@ class OutputStream:
         )
         self._data = None
 
-        # Send the end message
-        self._coordinator.relay(
-            Message(
-                id=self._message_id,
-                type=MessageType.CONTENT_STREAM_END,
-                sender=self._stream_id,
-                receiver="coordinator",
-            ),
-        )
-
-        # Send the final data
+        # Send any buffered chunks before closing the stream
+        self._flush_chunks()
 
-        self._coordinator.relay(
-            Message(
-                id=self._message_id,
-                type=MessageType.CONTENT,
-                sender=self._stream_id,
-                receiver="coordinator",
-                data=ContentData(
+        # End the stream and send the final data in one message
+        self._relay(
+            Message.model_construct(
+                **self._msg_base,
+                type=_FINAL_TYPE,
+                data=ContentData.model_construct(
                     content=(
                         output.model_dump()
                         if isinstance(
@@ -231,8 +541,8 @@ class OutputStream:
         """
         Bookkeeping entry.
         """
-        timestamp = time.time()
-        timestamped_data = {**data.model_dump(), "timestamp": timestamp}
+        timestamped_data = data.model_dump()
+        timestamped_data["timestamp"] = time.time()
 
         self._bookkeeping_queue.put_nowait((self._stream_id, timestamped_data))
 
@@ -240,11 +550,11 @@ class OutputStream:
         """
         Error entry.
         """
-        self._coordinator.relay(
-            Message(
-                type=MessageType.ERRORS,
-                sender=self._stream_id,
-                receiver="coordinator",
-                data=ErrorsData(errors=[Error(message=str(error))]),
+        self._flush_chunks()
+        self._relay(
+            Message.model_construct(
+                **self._msg_base,
+                type=_ERRORS_TYPE,
+                data=ErrorsData.model_construct(errors=[Error.model_construct(message=str(error))]),
             ),
         )
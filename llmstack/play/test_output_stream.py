@@ -0,0 +1,184 @@
+import asyncio
+import copy
+import random
+import unittest
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from llmstack.play.messages import Message, MessageType
+from llmstack.play.output_stream import (
+    OutputStream,
+    _build_stitcher,
+    _stitch_into,
+    stitch_model_objects,
+)
+
+
+class PartModel(BaseModel):
+    text: str = ""
+    index: Optional[int] = None
+
+
+class OutputModel(BaseModel):
+    text: str = ""
+    name: Optional[str] = None
+    part: Optional[PartModel] = None
+    parts: List[PartModel] = []
+    metadata: Optional[Dict[str, Any]] = None
+    child: Optional["OutputModel"] = None
+
+
+OutputModel.model_rebuild()
+
+
+def random_chunk(rng: random.Random, depth: int = 0) -> dict:
+    chunk = {}
+    for key in ["text", "name", "part", "parts", "metadata", "child", "extra"]:
+        if rng.random() < 0.4:
+            continue
+        if key in ("text", "name"):
+            chunk[key] = rng.choice([None, "", "a", "bc"])
+        elif key == "part":
+            chunk[key] = rng.choice([None, {"text": "t", "index": rng.choice([None, 0, 3])}])
+        elif key == "parts":
+            chunk[key] = [{"text": rng.choice(["", "p"])} for _ in range(rng.randint(0, 3))]
+        elif key == "metadata":
+            chunk[key] = rng.choice([None, "", {"k": "v"}, {"k": "w", "z": [1]}])
+        elif key == "child" and depth < 2:
+            chunk[key] = rng.choice([None, random_chunk(rng, depth + 1)])
+        elif key == "extra" and rng.random() < 0.2:
+            chunk[key] = "e"
+    return chunk
+
+
+class FakeCoordinatorProxy:
+    def __init__(self, messages: list):
+        self._messages = messages
+
+    def relay(self, message: Message) -> str:
+        self._messages.append(message)
+        return "relayed"
+
+
+class FakeCoordinatorRef:
+    def __init__(self, messages: list):
+        self._messages = messages
+
+    def is_alive(self) -> bool:
+        return True
+
+    def tell(self, message: Message) -> None:
+        self._messages.append(message)
+
+
+def make_stream(output_cls=OutputModel):
+    messages = []
+    stream = OutputStream(stream_id="test", coordinator_urn="test-urn", output_cls=output_cls)
+    stream._coordinator_ref = FakeCoordinatorRef(messages)
+    stream._coordinator_proxy = FakeCoordinatorProxy(messages)
+    return stream, messages
+
+
+def relayed_chunks(messages: list) -> list:
+    return [
+        chunk
+        for message in messages
+        if message.type == MessageType.CONTENT_STREAM_CHUNK
+        for chunk in message.data.chunks
+    ]
+
+
+class StitcherTest(unittest.TestCase):
+    def test_generated_stitcher_matches_stitch_model_objects(self):
+        rng = random.Random(0)
+        stitcher = _build_stitcher(OutputModel)
+        self.assertIs(_build_stitcher(OutputModel), stitcher)
+
+        for _ in range(2000):
+            chunks = [random_chunk(rng) for _ in range(rng.randint(1, 6))]
+            expected = None
+            in_place = None
+            generated = None
+            for chunk in chunks:
+                expected = stitch_model_objects(expected, copy.deepcopy(chunk))
+                in_place = _stitch_into(in_place, copy.deepcopy(chunk))
+                generated = stitcher(generated, copy.deepcopy(chunk))
+
+            self.assertEqual(in_place, expected, chunks)
+            self.assertEqual(generated, expected, chunks)
+
+    def test_stitch_does_not_share_chunks(self):
+        chunks = [{"metadata": ""}, {"metadata": {"k": "v"}}, {"metadata": {"k": "w"}}]
+        relayed = copy.deepcopy(chunks)
+
+        for stitch in (_stitch_into, _build_stitcher(OutputModel)):
+            data = None
+            for chunk in relayed:
+                data = stitch(data, chunk)
+
+            self.assertEqual(data, {"metadata": {"k": "vw"}})
+            self.assertEqual(relayed, chunks)
+
+
+class OutputStreamTest(unittest.TestCase):
+    def test_relayed_chunks_are_not_modified(self):
+        stream, messages = make_stream()
+        chunks = [
+            {"text": "a", "metadata": ""},
+            {"text": "b", "metadata": {"k": "v"}, "parts": [{"text": "p"}]},
+            {"text": "c", "metadata": {"k": "w"}, "parts": [{"text": "q"}, {"text": "r"}]},
+        ]
+
+        async def write_all():
+            for chunk in copy.deepcopy(chunks):
+                await stream.write(chunk)
+
+        asyncio.run(write_all())
+        output = stream.finalize()
+
+        self.assertEqual(relayed_chunks(messages), chunks)
+        self.assertEqual(output.text, "abc")
+        self.assertEqual(output.metadata, {"k": "vw"})
+        self.assertEqual([part.text for part in output.parts], ["pq", "r"])
+
+    def test_chunks_are_relayed_in_order_before_finalize(self):
+        stream, messages = make_stream()
+
+        async def write_all():
+            for i in range(100):
+                await stream.write(OutputModel(text=str(i)))
+
+        asyncio.run(write_all())
+        stream.finalize()
+
+        self.assertEqual([chunk["text"] for chunk in relayed_chunks(messages)], [str(i) for i in range(100)])
+        self.assertEqual(messages[-1].type, MessageType.CONTENT_STREAM_FINAL)
+        self.assertEqual(messages[-1].data.content["text"], "".join(str(i) for i in range(100)))
+
+    def test_chunks_are_flushed_before_error(self):
+        stream, messages = make_stream()
+        asyncio.run(stream.write({"text": "a"}))
+        asyncio.run(stream.write({"text": "b"}))
+        stream.error(Exception("failed"))
+
+        self.assertEqual(relayed_chunks(messages), [{"text": "a"}, {"text": "b"}])
+        self.assertEqual(messages[-1].type, MessageType.ERRORS)
+        self.assertEqual(messages[-1].data.errors[0].message, "failed")
+
+    def test_chunks_are_flushed_before_write_raw(self):
+        stream, messages = make_stream()
+        raw_message = Message(id="raw", type=MessageType.CONTENT, sender="test", receiver="coordinator")
+
+        async def write_all():
+            await stream.write({"text": "a"})
+            await stream.write({"text": "b"})
+            return await stream.write_raw(raw_message)
+
+        self.assertEqual(asyncio.run(write_all()), "relayed")
+        self.assertEqual(relayed_chunks(messages), [{"text": "a"}, {"text": "b"}])
+        self.assertIs(messages[-1], raw_message)
+
+
+if __name__ == "__main__":
+    unittest.main()